@@ -1,5 +1,14 @@
 import bpy
 import bmesh
+import hashlib
+import json
+import re
+import threading
+import zipfile
+import numpy as np
+from bpy.app.handlers import persistent
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
 
 bl_info = {
@@ -18,13 +27,15 @@ class LegolizeSettings(bpy.types.PropertyGroup):
         name="Brick scale",
         default=0.01,
         min=0.01,
-        max=0.1
+        max=0.1,
+        update=lambda self, context: update_layout(self)
     )
     displacement_scale: bpy.props.FloatProperty(
         name="Displacement scale",
         default=1.0,
         min=0.1,
-        max=10.0
+        max=10.0,
+        update=lambda self, context: update_layout(self)
     )
     full_size: bpy.props.BoolProperty(
         name="Use full-sized brick",
@@ -36,6 +47,47 @@ class LegolizeSettings(bpy.types.PropertyGroup):
         default="",
         subtype='DIR_PATH'
     )
+    use_sequence: bpy.props.BoolProperty(
+        name="Frame sequence",
+        description="Use the numbered displacement_####.png/color_####.png images in the folder, one pair per frame",
+        default=False,
+        update=lambda self, context: update_layout(self)
+    )
+    applied_record: bpy.props.StringProperty(
+        name="Applied record",
+        description="JSON record of the settings, input hashes and layout cache key the bricks were built from",
+        default="",
+        options={'HIDDEN'}
+    )
+    height_reduction: bpy.props.EnumProperty(
+        name="Height reduction",
+        description="How displacement pixels are combined for the coarser bricks of larger brick scales",
+        items=[
+            ('MAX', "Max", "Use the highest pixel, keeping peaks and ridges"),
+            ('MEAN', "Mean", "Use the average pixel height"),
+        ],
+        default='MAX',
+        update=lambda self, context: update_layout(self)
+    )
+    viewport_display: bpy.props.EnumProperty(
+        name="Viewport display",
+        description="How the bricks are shown in the viewport; renders always use the full bricks",
+        items=[
+            ('FULL', "Full bricks", "Show every brick, as in the render"),
+            ('DECIMATE', "Decimated bricks", "Show an evenly thinned-out subset of the bricks"),
+            ('POINTS', "Point cloud", "Show one point per brick, coloured by brick_color"),
+            ('BOUNDS', "Bounding boxes", "Show a plain box in place of each brick"),
+        ],
+        default='DECIMATE',
+        update=lambda self, context: update_modifier_inputs(self)
+    )
+    viewport_max_instances: bpy.props.IntProperty(
+        name="Viewport max bricks",
+        description="Maximum number of bricks drawn in the viewport for the proxy display modes",
+        default=20000,
+        min=1,
+        update=lambda self, context: update_modifier_inputs(self)
+    )
 
 
 class LEGOLIZE_OT_SelectImageFolder(bpy.types.Operator):
@@ -53,15 +105,75 @@ class LEGOLIZE_OT_SelectImageFolder(bpy.types.Operator):
         return {'RUNNING_MODAL'}
 
 
-def legolize(brickscale: float, displacementscale: float, use_full_size_brick) -> None:
-    # initial housekeeping
-    cleanup_scene()
+# order of the proxy branches on the LegolizeNodes "Viewport Display" index switch
+VIEWPORT_DISPLAY_MODES = ('FULL', 'DECIMATE', 'POINTS', 'BOUNDS')
+
 
-    # create the brick
-    create_brick(use_full_size_brick)
+def legolize(brickscale: float, use_full_size_brick) -> None:
+    settings = bpy.context.scene.legolize_settings
 
-    # now add the plane
-    create_terrain(displacementscale, brickscale, use_full_size_brick)
+    # Rebuild the scene only when the brick shape changed or a datablock is missing. Otherwise the
+    # existing objects, materials and node group are kept and only the applied record changes, so an
+    # undo step holds that record instead of a freshly allocated scene.
+    record = read_record(settings)
+    if (record.get("full_size") != use_full_size_brick
+            or "Brick" not in bpy.data.objects
+            or "Terrain" not in bpy.data.objects
+            or "LegolizeGeometry" not in bpy.data.objects["Terrain"].modifiers):
+        # initial housekeeping
+        cleanup_scene()
+        settings.applied_record = ""
+
+        # create the brick
+        create_brick(use_full_size_brick)
+
+        # now add the brick layout
+        create_terrain(brickscale, use_full_size_brick)
+    else:
+        update_layout(settings)
+
+
+def read_record(settings):
+    # Return the record of the last applied layout, or an empty dict if nothing was applied yet
+    try:
+        return json.loads(settings.applied_record)
+    except ValueError:
+        return {}
+
+
+def make_record(settings):
+    # Return a record of everything the bricks are derived from. The brick shape only changes on
+    # "Legolize!", so the full_size of an applied record is kept until then.
+    return {
+        "image_folder": settings.image_folder,
+        "use_sequence": settings.use_sequence,
+        "brick_scale": settings.brick_scale,
+        "displacement_scale": settings.displacement_scale,
+        "full_size": read_record(settings).get("full_size", settings.full_size),
+        "height_reduction": settings.height_reduction,
+    }
+
+
+def write_record(settings, record):
+    record = json.dumps(record)
+    if settings.applied_record != record:
+        settings.applied_record = record
+
+
+def update_modifier_inputs(settings, obj=None):
+    # Copy the viewport proxy settings onto the LegolizeGeometry modifier inputs
+    obj = obj or bpy.data.objects.get("Terrain")
+    if obj is None:
+        return
+    modifier = obj.modifiers.get("LegolizeGeometry")
+    if modifier is None or modifier.node_group is None:
+        return
+    inputs = modifier.node_group.interface.items_tree
+    if "Viewport Display" in inputs:
+        modifier[inputs["Viewport Display"].identifier] = VIEWPORT_DISPLAY_MODES.index(settings.viewport_display)
+    if "Viewport Max Instances" in inputs:
+        modifier[inputs["Viewport Max Instances"].identifier] = settings.viewport_max_instances
+    obj.update_tag()
 
 
 import bpy
@@ -73,7 +185,7 @@ def cleanup_scene():
     object_names_to_remove = ["Brick", "Terrain"]
 
     # List of material names to remove
-    material_names_to_remove = ["Terrain_material", "Brick_material"]
+    material_names_to_remove = ["Brick_material"]
 
     # Remove objects
     for obj_name in object_names_to_remove:
@@ -92,80 +204,523 @@ def cleanup_scene():
     bpy.ops.outliner.orphans_purge(do_recursive=True)
 
 
-def create_terrain(strength=1.0, brickscale=0.02, use_full_size_brick=False):
-    # Create plane and add subdivisions
-    bpy.ops.mesh.primitive_plane_add(size=2, enter_editmode=False, align='WORLD', location=(0, 0, 0), scale=(1, 1, 1))
-    obj = bpy.context.active_object
-    obj.name = "Terrain"
-
-    bpy.ops.object.mode_set(mode='EDIT')
-    bpy.ops.mesh.select_all(action='SELECT')
-    bpy.ops.mesh.subdivide(number_cuts=10)
-    bpy.ops.mesh.subdivide(number_cuts=6)
-
-    # Ensure UV map exists
-    bpy.ops.mesh.uv_texture_add()
-
-    bpy.ops.object.mode_set(mode='OBJECT')
-
-    # Create new material
-    mat = bpy.data.materials.new(name="Terrain_material")
-    mat.use_nodes = True
-    obj.data.materials.append(mat)
+def create_terrain(brickscale=0.02, use_full_size_brick=False):
+    # Create an empty mesh to carry the modifier; LegolizeNodes builds the bricks from the layout images
+    mesh = bpy.data.meshes.new(name="Terrain")
+    obj = bpy.data.objects.new(name="Terrain", object_data=mesh)
+    bpy.context.collection.objects.link(obj)
 
-    # Get material nodes
-    nodes = mat.node_tree.nodes
-    links = mat.node_tree.links
+    # Add geometry nodes modifier
+    create_geometry_nodes_modifier(obj, brickscale, use_full_size_brick)
 
-    # Clear default nodes
-    nodes.clear()
+    # Fill in the brick layout
+    update_layout(bpy.context.scene.legolize_settings, obj)
 
-    # Create nodes
-    node_tex_coord = nodes.new(type='ShaderNodeTexCoord')
-    node_tex_image = nodes.new(type='ShaderNodeTexImage')
-    node_principled = nodes.new(type='ShaderNodeBsdfPrincipled')
-    node_output = nodes.new(type='ShaderNodeOutputMaterial')
+    return obj
 
-    # The folder where the color and displacement images are located
-    image_folder = bpy.context.scene.legolize_settings.image_folder
 
-    # Load color image
-    color_img_path = os.path.join(image_folder, "color.png")
-    if os.path.exists(color_img_path):
-        color_img = bpy.data.images.load(color_img_path)
-        node_tex_image.image = color_img
+# Levels coarser than this are always kept; finer ones only while no coarser level has this many pixels.
+# The finest grid needed is 2 / (0.8 * 0.01) = 250 bricks across, at the minimum brick scale.
+PYRAMID_MAX_SIZE = 512
+# Stop reducing once a level is this small
+PYRAMID_MIN_SIZE = 8
+# Part of the pyramid cache keys; bump it when the cached data changes meaning
+PYRAMID_VERSION = 2
+
+# Number of pyramids and layouts kept in memory, enough to hold a few frames of a sequence either side
+CACHE_SIZE = 16
+
+# Number of layouts whose OpenEXR files are kept on disk, the oldest ones beyond it are deleted
+LAYOUT_CACHE_SIZE = 32
+
+# decoded pyramids by cache key, shared across brick scale changes
+_pyramid_cache = OrderedDict()
+# brick layouts (levels, colors) by layout key, so identical frames are laid out once
+_layout_cache = OrderedDict()
+# the caches are also filled from the sequence prefetch thread
+_cache_lock = threading.Lock()
+# file hashes by (path, mtime, size), so unchanged images are not hashed again
+_file_hashes = {}
+# numbered frame images by (folder, mtime)
+_sequence_frames = {}
+# folders already reported as holding no frame sequence
+_missing_sequences = set()
+
+# Frames ahead of the current one that are prefetched in sequence mode
+PREFETCH_FRAMES = 3
+# Seconds between decode_ahead timer ticks
+PREFETCH_INTERVAL = 0.1
+
+SEQUENCE_PATTERN = re.compile(r"^(displacement|color)_(\d+)\.png$")
+
+
+def get_cached(cache, key):
+    with _cache_lock:
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+        return value
+
+
+def set_cached(cache, key, value):
+    with _cache_lock:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > CACHE_SIZE:
+            cache.popitem(last=False)
+
+
+def hash_file(path):
+    stat = os.stat(path)
+    stat_key = (path, stat.st_mtime_ns, stat.st_size)
+    if stat_key not in _file_hashes:
+        digest = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        _file_hashes[stat_key] = digest.hexdigest()
+    return _file_hashes[stat_key]
+
+
+def get_cache_folder(image_folder):
+    return os.path.join(image_folder, ".legolize_cache")
+
+
+def load_image_pixels(path, linear=False):
+    # Decode an image into a (height, width, 4) float32 array, bottom row first like the UV map.
+    # With linear=True the colors are converted to linear like an Image Texture node does; byte images
+    # otherwise give their raw sRGB-encoded values, float images are linear already.
+    img = bpy.data.images.load(path, check_existing=False)
+    try:
+        width, height = img.size
+        pixels = np.empty(width * height * 4, dtype=np.float32)
+        img.pixels.foreach_get(pixels)
+        srgb = not img.is_float and img.colorspace_settings.name == 'sRGB'
+    finally:
+        bpy.data.images.remove(img)
+    pixels = pixels.reshape(height, width, 4)
+    if linear and srgb:
+        rgb = pixels[..., :3]
+        pixels[..., :3] = np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+    return pixels
+
+
+def reduce_level(level, reduction):
+    # Halve a level in both directions, repeating the last row/column of odd-sized levels
+    rows, cols = level.shape[:2]
+    padding = ((0, rows % 2), (0, cols % 2)) + ((0, 0),) * (level.ndim - 2)
+    level = np.pad(level, padding, mode='edge')
+    blocks = level.reshape(level.shape[0] // 2, 2, level.shape[1] // 2, 2, *level.shape[2:])
+    if reduction == 'MAX':
+        return blocks.max(axis=(1, 3))
+    return blocks.mean(axis=(1, 3), dtype=np.float32)
+
+
+def build_pyramid(base, reduction):
+    levels = [base]
+    while max(levels[-1].shape[:2]) > PYRAMID_MIN_SIZE:
+        levels.append(reduce_level(levels[-1], reduction))
+    # drop full-resolution levels that no brick scale will ever pick
+    while len(levels) > 1 and min(levels[1].shape[:2]) >= PYRAMID_MAX_SIZE:
+        levels.pop(0)
+    return levels
+
+
+def get_pyramid_key(path, kind, reduction='MEAN'):
+    return f"{hash_file(path)}_{kind.lower()}_{reduction.lower()}_v{PYRAMID_VERSION}"
+
+
+def get_pyramid(path, kind, reduction='MEAN', decode=True):
+    # Return the (cache key, levels) pyramid of a displacement ('HEIGHT') or color ('COLOR') image,
+    # finest level first, from memory, the on-disk cache or by decoding the image.
+    # Decoding goes through bpy, so off the main thread pass decode=False; levels is None on a cache miss.
+    key = get_pyramid_key(path, kind, reduction)
+    levels = get_cached(_pyramid_cache, key)
+    if levels is not None:
+        return key, levels
+
+    cache_path = os.path.join(get_cache_folder(os.path.dirname(path)), key + ".npz")
+    if os.path.exists(cache_path):
+        try:
+            with np.load(cache_path) as data:
+                levels = [data[f"level_{i}"] for i in range(len(data.files))]
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+            # a truncated or foreign file, decode the image again and replace it
+            print(f"Warning: Ignoring unreadable pyramid cache {cache_path}: {str(e)}")
+            levels = None
+    if levels is None:
+        if not decode:
+            return key, None
+        # heights stay raw like the displace modifier read them, colors are linear like the Image Texture node
+        pixels = load_image_pixels(path, linear=kind == 'COLOR')
+        # the displace modifier uses the intensity of the image
+        base = pixels[..., :3].mean(axis=2) if kind == 'HEIGHT' else pixels
+        levels = build_pyramid(base, reduction)
+        if save_pyramid(cache_path, levels):
+            print(f"Cached {kind.lower()} pyramid for {path}")
+
+    set_cached(_pyramid_cache, key, levels)
+    return key, levels
+
+
+def save_pyramid(cache_path, levels):
+    # Write the pyramid under a temporary name and move it into place, so a crash or a concurrent reader
+    # never sees a partial file. Returns False if it could not be written, the pyramid then stays in memory only.
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(temp_path, 'wb') as f:
+            np.savez(f, **{f"level_{i}": level for i, level in enumerate(levels)})
+        os.replace(temp_path, cache_path)
+    except OSError as e:
+        print(f"Warning: Could not cache the pyramid in {os.path.dirname(cache_path)}, keeping it in memory: {str(e)}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return False
+    return True
+
+
+def sample_pyramid(levels, columns):
+    # Sample a columns x columns grid from the coarsest level that still has a pixel per column
+    level = next((level for level in reversed(levels) if min(level.shape[:2]) >= columns), levels[0])
+    rows = ((np.arange(columns) + 0.5) * level.shape[0] / columns).astype(np.int64)
+    cols = ((np.arange(columns) + 0.5) * level.shape[1] / columns).astype(np.int64)
+    return level[np.ix_(rows, cols)]
+
+
+def compute_layout(heights, colors, brickscale, strength, use_full_size_brick):
+    # Return the (columns, columns, 4) brick levels and colors of the brick columns on the 2 x 2 terrain
+    # plane, bottom row first. The levels hold the top and bottom brick of each column in red and green.
+    spacing = 0.8 * brickscale
+    layer = (0.96 if use_full_size_brick else 0.32) * brickscale
+    columns = max(1, int(2.0 / spacing))
+
+    # top brick of every column, displaced around a mid level of 0.5 like the displace modifier
+    top = np.round((sample_pyramid(heights, columns) - 0.5) * strength / layer)
+    # stack each column down to its lowest neighbour so steep slopes have no gaps
+    padded = np.pad(top, 1, mode='edge')
+    lowest_neighbour = np.minimum.reduce([padded[:-2, 1:-1], padded[2:, 1:-1], padded[1:-1, :-2], padded[1:-1, 2:]])
+    bottom = np.minimum(lowest_neighbour + 1, top)
+
+    brick_levels = np.zeros((columns, columns, 4), dtype=np.float32)
+    brick_levels[..., 0] = top
+    brick_levels[..., 1] = bottom
+    brick_levels[..., 3] = 1.0
+    brick_colors = sample_pyramid(colors, columns).astype(np.float32)
+    return brick_levels, brick_colors
+
+
+def save_layout_image(path, pixels):
+    # Write a (rows, cols, 4) float array to an OpenEXR file through a temporary image
+    rows, cols = pixels.shape[:2]
+    img = bpy.data.images.new("Legolize_layout_tmp", cols, rows, alpha=True, float_buffer=True)
+    try:
+        img.pixels.foreach_set(pixels.ravel())
+        img.filepath_raw = path
+        img.file_format = 'OPEN_EXR'
+        img.save()
+    finally:
+        bpy.data.images.remove(img)
+
+
+def set_layout_image(node_group, name, path, node_names, reload=False):
+    # Point a layout image at a file, creating it on first use. The image is loaded from the
+    # .legolize_cache file and not packed, so undo steps only hold its file path.
+    img = bpy.data.images.get(name)
+    if img is None:
+        img = bpy.data.images.load(path, check_existing=False)
+        img.name = name
+        img.colorspace_settings.name = 'Non-Color'
+    elif img.filepath != path:
+        img.filepath = path
+    elif reload:
+        img.reload()
+    # Image
+    for node_name in node_names:
+        node = node_group.nodes.get(node_name)
+        if node is not None and node.inputs[0].default_value != img:
+            node.inputs[0].default_value = img
+    return img
+
+
+def get_sequence_frames(image_folder):
+    # Return {frame: (displacement path, color path)} for the displacement_####.png/color_####.png files
+    if not os.path.isdir(image_folder):
+        return {}
+    stat_key = (image_folder, os.stat(image_folder).st_mtime_ns)
+    if stat_key not in _sequence_frames:
+        frames = {}
+        for name in os.listdir(image_folder):
+            match = SEQUENCE_PATTERN.match(name)
+            if match:
+                frames.setdefault(int(match.group(2)), {})[match.group(1)] = os.path.join(image_folder, name)
+        _sequence_frames[stat_key] = {frame: (paths.get("displacement"), paths.get("color"))
+                                      for frame, paths in frames.items()}
+    return _sequence_frames[stat_key]
+
+
+def get_image_paths(record, frame):
+    # Return the (displacement path, color path) to use at the given scene frame, or None without frames
+    image_folder = bpy.path.abspath(record["image_folder"])
+    if not record["use_sequence"]:
+        return os.path.join(image_folder, "displacement.png"), os.path.join(image_folder, "color.png")
+
+    frames = get_sequence_frames(image_folder)
+    if not frames:
+        if image_folder not in _missing_sequences:
+            print(f"Warning: No displacement_####.png/color_####.png frames found in {image_folder}")
+            _missing_sequences.add(image_folder)
+        return None
+    _missing_sequences.discard(image_folder)
+    # hold the last numbered frame until the next one, and the first one before the sequence starts
+    earlier = [number for number in frames if number <= frame]
+    return frames[max(earlier) if earlier else min(frames)]
+
+
+def get_layout_params(record):
+    # The record fields that determine the layout, as plain values that can be handed to the prefetch thread
+    return record["height_reduction"], record["brick_scale"], record["displacement_scale"], record["full_size"]
+
+
+def get_layout_key(displacement_img_path, color_img_path, params):
+    # The images are identified by their hash, so identical frames share a layout
+    height_reduction, brickscale, strength, use_full_size_brick = params
+    if displacement_img_path and os.path.exists(displacement_img_path):
+        height_key = get_pyramid_key(displacement_img_path, 'HEIGHT', height_reduction)
     else:
-        print(f"Warning: Color image not found at {color_img_path}")
-
-    # Link nodes
-    links.new(node_tex_coord.outputs['UV'], node_tex_image.inputs['Vector'])
-    links.new(node_tex_image.outputs['Color'], node_principled.inputs['Base Color'])
-    links.new(node_principled.outputs['BSDF'], node_output.inputs['Surface'])
-
-    # Add displacement modifier
-    mod = obj.modifiers.new(name="Displace", type='DISPLACE')
-    mod.texture_coords = 'UV'
-    mod.strength = strength
-
-    # Create a new texture for displacement
-    tex = bpy.data.textures.new(name="DisplacementTexture", type='IMAGE')
-    displacement_img_path = os.path.join(image_folder, "displacement.png")
-    if os.path.exists(displacement_img_path):
-        displacement_img = bpy.data.images.load(displacement_img_path)
-        tex.image = displacement_img
+        height_key = "flat"
+    if color_img_path and os.path.exists(color_img_path):
+        color_key = get_pyramid_key(color_img_path, 'COLOR')
     else:
-        print(f"Warning: Displacement image not found at {displacement_img_path}")
+        color_key = "white"
+    return f"{height_key}:{color_key}:{brickscale:g}:{strength:g}:{int(use_full_size_brick)}"
 
-    # Assign the texture to the modifier
-    mod.texture = tex
 
-    # Convert to mesh
-    bpy.ops.object.convert(target='MESH')
+def get_layout(displacement_img_path, color_img_path, params, decode=True):
+    # Return (layout key, (levels, colors)) for a pair of images, or (None, None) when decode=False and
+    # a pyramid still needs decoding. Safe to call off the main thread with decode=False.
+    height_reduction, brickscale, strength, use_full_size_brick = params
+    layout_key = get_layout_key(displacement_img_path, color_img_path, params)
+    layout = get_cached(_layout_cache, layout_key)
+    if layout is not None:
+        return layout_key, layout
 
-    # Add geometry nodes modifier
-    create_geometry_nodes_modifier(obj, brickscale, use_full_size_brick)
+    if displacement_img_path and os.path.exists(displacement_img_path):
+        _, heights = get_pyramid(displacement_img_path, 'HEIGHT', height_reduction, decode)
+    else:
+        print(f"Warning: Displacement image not found at {displacement_img_path}")
+        heights = [np.full((1, 1), 0.5, dtype=np.float32)]
 
-    return obj
+    if color_img_path and os.path.exists(color_img_path):
+        _, colors = get_pyramid(color_img_path, 'COLOR', decode=decode)
+    else:
+        print(f"Warning: Color image not found at {color_img_path}")
+        colors = [np.ones((1, 1, 4), dtype=np.float32)]
+
+    if heights is None or colors is None:
+        return None, None
+
+    layout = compute_layout(heights, colors, brickscale, strength, use_full_size_brick)
+    set_cached(_layout_cache, layout_key, layout)
+    return layout_key, layout
+
+
+def get_layout_folder(record, temporary=False):
+    # Layouts go to the .legolize_cache folder of the images, or to Blender's session temp folder
+    # when no image folder is set or it cannot be written to
+    image_folder = bpy.path.abspath(record["image_folder"]) if record["image_folder"] else ""
+    if image_folder and not temporary:
+        cache_folder = get_cache_folder(image_folder)
+        if os.access(cache_folder if os.path.isdir(cache_folder) else image_folder, os.W_OK):
+            return cache_folder
+    return os.path.join(bpy.app.tempdir, "legolize_cache")
+
+
+def get_layout_paths(record, layout_key, temporary=False):
+    # Return the (levels, colors) OpenEXR files of a layout
+    cache_folder = get_layout_folder(record, temporary)
+    name = hashlib.sha1(layout_key.encode()).hexdigest()[:16]
+    return (os.path.join(cache_folder, f"layout_{name}_levels.exr"),
+            os.path.join(cache_folder, f"layout_{name}_colors.exr"))
+
+
+def write_layout(paths, layout):
+    # Save a layout's (levels, colors) OpenEXR files and return whether that worked
+    try:
+        os.makedirs(os.path.dirname(paths[0]), exist_ok=True)
+        for path, pixels in zip(paths, layout):
+            save_layout_image(path, pixels)
+    except (OSError, RuntimeError) as e:
+        print(f"Warning: Could not write the brick layout to {os.path.dirname(paths[0])}: {str(e)}")
+        return False
+    prune_layout_files(os.path.dirname(paths[0]))
+    return True
+
+
+def prune_layout_files(cache_folder):
+    # Delete the oldest layout files beyond LAYOUT_CACHE_SIZE layouts, keeping the ones the layout images show.
+    # Undo steps may still point at a deleted layout; apply_record() writes it again when they are restored.
+    in_use = {bpy.path.abspath(img.filepath) for img in bpy.data.images if img.name.startswith("Legolize_layout")}
+    paths = [os.path.join(cache_folder, name) for name in os.listdir(cache_folder)
+             if name.startswith("layout_") and name.endswith(".exr")]
+    paths.sort(key=os.path.getmtime, reverse=True)
+    for path in paths[LAYOUT_CACHE_SIZE * 2:]:
+        if path not in in_use:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class SequencePrefetcher:
+    # Loads the pyramids and computes the layouts of a window of upcoming frames on a background thread.
+    # Images are only decoded through bpy, which is not thread-safe, so frames the thread finds missing
+    # from the pyramid cache are decoded ahead by the decode_ahead timer on the main thread, one per tick.
+
+    def __init__(self):
+        self.executor = None
+        self.pending = {}
+
+    def prefetch(self, requests):
+        # forget requests for frames that left the window
+        for request in [request for request in self.pending if request not in requests]:
+            self.pending.pop(request).cancel()
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="legolize_prefetch")
+        for request in requests:
+            if request not in self.pending:
+                self.pending[request] = self.executor.submit(get_layout, *request, decode=False)
+        if not bpy.app.timers.is_registered(decode_ahead):
+            bpy.app.timers.register(decode_ahead, first_interval=PREFETCH_INTERVAL)
+
+    def wait(self, displacement_img_path, color_img_path, params):
+        # Wait for a prefetch of these images to land in the caches, if one was started
+        future = self.pending.pop((displacement_img_path, color_img_path, params), None)
+        if future is None or future.cancelled():
+            return
+        try:
+            future.result()
+        except Exception as e:
+            print(f"Warning: Prefetching {displacement_img_path} failed: {str(e)}")
+
+    def shutdown(self):
+        if bpy.app.timers.is_registered(decode_ahead):
+            bpy.app.timers.unregister(decode_ahead)
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+        self.pending.clear()
+
+
+_prefetcher = SequencePrefetcher()
+
+
+def decode_ahead():
+    # Timer: decode the next frame of the prefetch window that the background thread found uncached
+    if bpy.app.is_job_running('RENDER'):
+        return PREFETCH_INTERVAL
+    for request, future in list(_prefetcher.pending.items()):
+        if not future.done():
+            return PREFETCH_INTERVAL
+        if not future.cancelled() and future.exception() is None and future.result()[0] is None:
+            get_layout(*request)
+            del _prefetcher.pending[request]
+            return PREFETCH_INTERVAL
+    return None
+
+
+def apply_record(record, scene, obj):
+    # Show the bricks described by an applied record at the current frame and return the layout key,
+    # or None if there is nothing to show. Only the layout image paths and the brick scale input
+    # change, the bricks themselves are built by LegolizeNodes from the layout images.
+    modifier = obj.modifiers.get("LegolizeGeometry")
+    if modifier is None or modifier.node_group is None:
+        return None
+
+    layout_key = record.get("layout") if not record["use_sequence"] else None
+    layout_paths = get_layout_paths(record, layout_key) if layout_key is not None else ()
+    rebuilt = False
+    if layout_key is None or not all(os.path.exists(path) for path in layout_paths):
+        params = get_layout_params(record)
+        image_paths = get_image_paths(record, scene.frame_current)
+        if image_paths is None:
+            # keep showing the current layout
+            return None
+        if record["use_sequence"]:
+            _prefetcher.wait(*image_paths, params)
+        layout_key = get_layout_key(*image_paths, params)
+        layout_paths = get_layout_paths(record, layout_key)
+        if not all(os.path.exists(path) for path in layout_paths):
+            _, layout = get_layout(*image_paths, params)
+            if not write_layout(layout_paths, layout):
+                layout_paths = get_layout_paths(record, layout_key, temporary=True)
+                if not all(os.path.exists(path) for path in layout_paths) and not write_layout(layout_paths, layout):
+                    # keep showing the current layout
+                    return None
+            # layout images already pointing at these paths still hold the pixels of the deleted files
+            rebuilt = True
+
+        if record["use_sequence"]:
+            upcoming = [get_image_paths(record, scene.frame_current + scene.frame_step * i)
+                        for i in range(1, PREFETCH_FRAMES + 1)]
+            _prefetcher.prefetch([(*paths, params) for paths in dict.fromkeys(upcoming) if paths != image_paths])
+
+    levels_path, colors_path = layout_paths
+    set_layout_image(modifier.node_group, "Legolize_layout_levels", levels_path, ("Levels Info", "Levels Texture"),
+                     rebuilt)
+    set_layout_image(modifier.node_group, "Legolize_layout_colors", colors_path, ("Colors Texture",), rebuilt)
+
+    inputs = modifier.node_group.interface.items_tree
+    if "Brick Scale" in inputs and modifier[inputs["Brick Scale"].identifier] != record["brick_scale"]:
+        modifier[inputs["Brick Scale"].identifier] = record["brick_scale"]
+    obj.update_tag()
+    return layout_key
+
+
+def update_layout(settings, obj=None):
+    # Apply the current settings: record them and show the resulting layout
+    obj = obj or bpy.data.objects.get("Terrain")
+    if obj is None or "LegolizeGeometry" not in obj.modifiers:
+        return
+
+    record = make_record(settings)
+    layout_key = apply_record(record, settings.id_data, obj)
+    if layout_key is None:
+        return
+    # the record references the layout cache and, through the layout key, the image hashes
+    record["layout"] = layout_key
+    write_record(settings, record)
+    update_modifier_inputs(settings, obj)
+
+
+@persistent
+def legolize_frame_change(scene, depsgraph=None):
+    # Swap in the brick layout of the current frame in sequence mode; the record stays as it is
+    record = read_record(scene.legolize_settings)
+    obj = bpy.data.objects.get("Terrain")
+    if not record.get("use_sequence") or obj is None:
+        return
+    # editing data while a render job reads it is only safe with the interface locked
+    if bpy.app.is_job_running('RENDER') and not scene.render.use_lock_interface:
+        print("Warning: Enable Render > Lock Interface to render Legolize frame sequences")
+        return
+    apply_record(record, scene, obj)
+
+
+@persistent
+def legolize_undo_redo(scene, *args):
+    # Undo and redo restore only the small applied record and the layout image paths; rebuild the
+    # shown layout from its fields through the layout cache if its files are gone
+    record = read_record(scene.legolize_settings)
+    obj = bpy.data.objects.get("Terrain")
+    if record and obj is not None:
+        apply_record(record, scene, obj)
+
+
+@persistent
+def legolize_load_post(*args):
+    # Recreate the layout images of an opened file if they were cleared from .legolize_cache
+    legolize_undo_redo(bpy.context.scene)
 
 
 def create_brick(full_size):
@@ -334,21 +889,44 @@ def create_brick_material_node_group(mat):
     attribute.attribute_name = "brick_color"
     attribute.attribute_type = 'INSTANCER'
 
+    # node Point Attribute (brick_color on the viewport point cloud proxy)
+    point_attribute = brick_material.nodes.new("ShaderNodeAttribute")
+    point_attribute.name = "Point Attribute"
+    point_attribute.attribute_name = "brick_color"
+    point_attribute.attribute_type = 'GEOMETRY'
+
+    # node Mix (only one of the two attributes exists on any given geometry, the other reads black)
+    mix = brick_material.nodes.new("ShaderNodeMix")
+    mix.name = "Mix"
+    mix.data_type = 'RGBA'
+    mix.blend_type = 'ADD'
+    mix.clamp_result = False
+    # Factor
+    mix.inputs[0].default_value = 1.0
+
     # Set locations
     principled_bsdf.location = (143.67501831054688, 245.3406524658203)
     material_output.location = (499.4417419433594, 250.8231201171875)
-    attribute.location = (-162.23829650878906, 155.54095458984375)
+    attribute.location = (-382.23829650878906, 235.54095458984375)
+    point_attribute.location = (-382.23829650878906, 35.54095458984375)
+    mix.location = (-162.23829650878906, 155.54095458984375)
 
     # Set dimensions
     principled_bsdf.width, principled_bsdf.height = 240.0, 100.0
     material_output.width, material_output.height = 140.0, 100.0
     attribute.width, attribute.height = 140.0, 100.0
+    point_attribute.width, point_attribute.height = 140.0, 100.0
+    mix.width, mix.height = 140.0, 100.0
 
     # initialize brick_material links
     # principled_bsdf.BSDF -> material_output.Surface
     brick_material.links.new(principled_bsdf.outputs[0], material_output.inputs[0])
-    # attribute.Color -> principled_bsdf.Base Color
-    brick_material.links.new(attribute.outputs[0], principled_bsdf.inputs[0])
+    # attribute.Color -> mix.A
+    brick_material.links.new(attribute.outputs[0], mix.inputs[6])
+    # point_attribute.Color -> mix.B
+    brick_material.links.new(point_attribute.outputs[0], mix.inputs[7])
+    # mix.Result -> principled_bsdf.Base Color
+    brick_material.links.new(mix.outputs[2], principled_bsdf.inputs[0])
     return brick_material
 
 
@@ -370,6 +948,13 @@ def create_geometry_nodes_modifier(obj, scale=1.0, full_size=False):
                                                            socket_type='NodeSocketGeometry')
     geometry_socket_1.attribute_domain = 'POINT'
 
+    # Socket Brick Scale
+    brick_scale_socket = legolizenodes.interface.new_socket(name="Brick Scale", in_out='INPUT',
+                                                            socket_type='NodeSocketFloat')
+    brick_scale_socket.default_value = scale
+    brick_scale_socket.min_value = 0.01
+    brick_scale_socket.max_value = 0.1
+
     # node Original Geom Input
     original_geom_input = legolizenodes.nodes.new("NodeGroupInput")
     original_geom_input.label = "Original"
@@ -381,72 +966,6 @@ def create_geometry_nodes_modifier(obj, scale=1.0, full_size=False):
     final_geom_output.name = "Final Geom Output"
     final_geom_output.is_active_output = True
 
-    # node Bounding Box
-    bounding_box = legolizenodes.nodes.new("GeometryNodeBoundBox")
-    bounding_box.name = "Bounding Box"
-
-    # node Scale Elements
-    scale_elements = legolizenodes.nodes.new("GeometryNodeScaleElements")
-    scale_elements.name = "Scale Elements"
-    scale_elements.domain = 'FACE'
-    scale_elements.scale_mode = 'SINGLE_AXIS'
-    # Selection
-    scale_elements.inputs[1].default_value = True
-    # Scale
-    scale_elements.inputs[2].default_value = 2.0
-    # Center
-    scale_elements.inputs[3].default_value = (0.0, 0.0, 0.0)
-    # Axis
-    scale_elements.inputs[4].default_value = (0.0, 0.0, 1.0)
-
-    # node Object Info
-    object_info = legolizenodes.nodes.new("GeometryNodeObjectInfo")
-    object_info.name = "Object Info"
-    object_info.transform_space = 'ORIGINAL'
-    if "Brick" in bpy.data.objects:
-        object_info.inputs[0].default_value = bpy.data.objects["Brick"]
-    # As Instance
-    object_info.inputs[1].default_value = False
-
-    # node Instance on Points
-    instance_on_points = legolizenodes.nodes.new("GeometryNodeInstanceOnPoints")
-    instance_on_points.name = "Instance on Points"
-    # Pick Instance
-    instance_on_points.inputs[3].default_value = False
-    # Instance Index
-    instance_on_points.inputs[4].default_value = 0
-    # Rotation
-    instance_on_points.inputs[5].default_value = (0.0, 0.0, 0.0)
-
-    # node Distribute Points in Volume.001
-    distribute_points_in_volume_001 = legolizenodes.nodes.new("GeometryNodeDistributePointsInVolume")
-    distribute_points_in_volume_001.name = "Distribute Points in Volume.001"
-    distribute_points_in_volume_001.mode = 'DENSITY_GRID'
-    # Density
-    distribute_points_in_volume_001.inputs[1].default_value = 1.0
-    # Seed
-    distribute_points_in_volume_001.inputs[2].default_value = 0
-    # Threshold
-    distribute_points_in_volume_001.inputs[4].default_value = 0.0
-
-    # node Mesh to Volume
-    mesh_to_volume = legolizenodes.nodes.new("GeometryNodeMeshToVolume")
-    mesh_to_volume.name = "Mesh to Volume"
-    mesh_to_volume.resolution_mode = 'VOXEL_AMOUNT'
-    # Density
-    mesh_to_volume.inputs[1].default_value = 1.0
-    # Voxel Size
-    mesh_to_volume.inputs[2].default_value = 0.3
-    # Voxel Amount
-    mesh_to_volume.inputs[3].default_value = 64.0
-    # Interior Band Width
-    mesh_to_volume.inputs[4].default_value = 0.2
-
-    # node Value
-    value = legolizenodes.nodes.new("ShaderNodeValue")
-    value.name = "Value"
-    value.label = "Brick Scale"
-    value.outputs[0].default_value = scale
     # node Vector
     vector = legolizenodes.nodes.new("FunctionNodeInputVector")
     vector.name = "Vector"
@@ -455,117 +974,169 @@ def create_geometry_nodes_modifier(obj, scale=1.0, full_size=False):
     else:
         vector.vector = (0.8, 0.8, 0.32) #1/3rd-height brick
 
-    # node Vector Math
+    # node Vector Math (brick spacing and layer height)
     vector_math = legolizenodes.nodes.new("ShaderNodeVectorMath")
     vector_math.name = "Vector Math"
     vector_math.operation = 'SCALE'
-    # Vector_001
-    vector_math.inputs[1].default_value = (0.0, 0.0, 0.0)
-    # Vector_002
-    vector_math.inputs[2].default_value = (0.0, 0.0, 0.0)
 
-    # node Geometry Proximity
-    geometry_proximity = legolizenodes.nodes.new("GeometryNodeProximity")
-    geometry_proximity.name = "Geometry Proximity"
-    geometry_proximity.target_element = 'FACES'
+    # node Separate XYZ
+    separate_xyz = legolizenodes.nodes.new("ShaderNodeSeparateXYZ")
+    separate_xyz.name = "Separate XYZ"
+
+    # node Levels Info (the layout images hold one pixel per brick column, see compute_layout)
+    levels_info = legolizenodes.nodes.new("GeometryNodeImageInfo")
+    levels_info.name = "Levels Info"
+    # Frame
+    levels_info.inputs[1].default_value = 0
+
+    # node Grid Span
+    grid_span = legolizenodes.nodes.new("ShaderNodeMath")
+    grid_span.name = "Grid Span"
+    grid_span.operation = 'SUBTRACT'
+    grid_span.use_clamp = False
+    # Value_001
+    grid_span.inputs[1].default_value = 1.0
+
+    # node Grid Size
+    grid_size = legolizenodes.nodes.new("ShaderNodeMath")
+    grid_size.name = "Grid Size"
+    grid_size.operation = 'MULTIPLY'
+    grid_size.use_clamp = False
+
+    # node Grid (one vertex per brick column)
+    grid = legolizenodes.nodes.new("GeometryNodeMeshGrid")
+    grid.name = "Grid"
+
+    # node Mesh to Points
+    mesh_to_points = legolizenodes.nodes.new("GeometryNodeMeshToPoints")
+    mesh_to_points.name = "Mesh to Points"
+    mesh_to_points.mode = 'VERTICES'
+    # Selection
+    mesh_to_points.inputs[1].default_value = True
+    # Radius
+    mesh_to_points.inputs[3].default_value = 0.05
+
+    # node Layout Size
+    layout_size = legolizenodes.nodes.new("ShaderNodeMath")
+    layout_size.name = "Layout Size"
+    layout_size.operation = 'MULTIPLY'
+    layout_size.use_clamp = False
 
     # node Position
     position = legolizenodes.nodes.new("GeometryNodeInputPosition")
     position.name = "Position"
 
-    # node Compare
-    compare = legolizenodes.nodes.new("FunctionNodeCompare")
-    compare.name = "Compare"
-    compare.data_type = 'FLOAT'
-    compare.mode = 'ELEMENT'
-    compare.operation = 'LESS_EQUAL'
-    # A_INT
-    compare.inputs[2].default_value = 0
-    # B_INT
-    compare.inputs[3].default_value = 0
-    # B_VEC3
-    compare.inputs[5].default_value = (0.0, 0.0, 0.0)
-    # A_COL
-    compare.inputs[6].default_value = (0.800000011920929, 0.800000011920929, 0.800000011920929, 1.0)
-    # B_COL
-    compare.inputs[7].default_value = (0.800000011920929, 0.800000011920929, 0.800000011920929, 1.0)
-    # A_STR
-    compare.inputs[8].default_value = ""
-    # B_STR
-    compare.inputs[9].default_value = ""
-    # C
-    compare.inputs[10].default_value = 0.8999999761581421
-    # Angle
-    compare.inputs[11].default_value = 0.08726649731397629
-    # Epsilon
-    compare.inputs[12].default_value = 0.0010000000474974513
-
-    # node Math
-    math = legolizenodes.nodes.new("ShaderNodeMath")
-    math.name = "Math"
-    math.operation = 'MULTIPLY'
-    math.use_clamp = False
-    # Value_001
-    math.inputs[1].default_value = 0.5
-    # Value_002
-    math.inputs[2].default_value = 0.5
-
-    # node Sample Index
-    sample_index = legolizenodes.nodes.new("GeometryNodeSampleIndex")
-    sample_index.name = "Sample Index"
-    sample_index.clamp = False
-    sample_index.data_type = 'FLOAT_COLOR'
-    sample_index.domain = 'POINT'
-
-    # node Sample Nearest
-    sample_nearest = legolizenodes.nodes.new("GeometryNodeSampleNearest")
-    sample_nearest.name = "Sample Nearest"
-    sample_nearest.domain = 'POINT'
-    # Sample Position
-    sample_nearest.inputs[1].default_value = (0.0, 0.0, 0.0)
-
-    # node Image Texture
-    image_texture = legolizenodes.nodes.new("GeometryNodeImageTexture")
-    image_texture.name = "Image Texture"
-    image_texture.extension = 'REPEAT'
-    image_texture.interpolation = 'Linear'
-
-    # Get the image from the Terrain_material
-    terrain_material = bpy.data.materials.get("Terrain_material")
-    if terrain_material and terrain_material.use_nodes:
-        # Find the Image Texture node in the material
-        for node in terrain_material.node_tree.nodes:
-            if node.type == 'TEX_IMAGE' and node.image:
-                # Assign the image to our Geometry Node
-                if 'Image' in image_texture.inputs:
-                    image_texture.inputs['Image'].default_value = node.image
-                    print(f"Assigned image from Terrain_material: {node.image.name}")
-                    break
-        else:
-            print("Warning: No image texture found in Terrain_material")
-    else:
-        print("Warning: Terrain_material not found or doesn't use nodes")
+    # node Layout UV Scale (position to column pixel centre)
+    layout_uv_scale = legolizenodes.nodes.new("ShaderNodeVectorMath")
+    layout_uv_scale.name = "Layout UV Scale"
+    layout_uv_scale.operation = 'DIVIDE'
+
+    # node Layout UV
+    layout_uv = legolizenodes.nodes.new("ShaderNodeVectorMath")
+    layout_uv.name = "Layout UV"
+    layout_uv.operation = 'ADD'
+    # Vector_001
+    layout_uv.inputs[1].default_value = (0.5, 0.5, 0.0)
 
+    # node Levels Texture
+    levels_texture = legolizenodes.nodes.new("GeometryNodeImageTexture")
+    levels_texture.name = "Levels Texture"
+    levels_texture.extension = 'EXTEND'
+    levels_texture.interpolation = 'Closest'
     # Frame
-    image_texture.inputs[2].default_value = 0
+    levels_texture.inputs[2].default_value = 0
+
+    # node Separate Levels (red is the top brick, green the bottom brick of the column)
+    separate_levels = legolizenodes.nodes.new("FunctionNodeSeparateColor")
+    separate_levels.name = "Separate Levels"
+    separate_levels.mode = 'RGB'
+
+    # node Column Height
+    column_height = legolizenodes.nodes.new("ShaderNodeMath")
+    column_height.name = "Column Height"
+    column_height.operation = 'SUBTRACT'
+    column_height.use_clamp = False
+
+    # node Column Count
+    column_count = legolizenodes.nodes.new("ShaderNodeMath")
+    column_count.name = "Column Count"
+    column_count.operation = 'ADD'
+    column_count.use_clamp = False
+    # Value_001
+    column_count.inputs[1].default_value = 1.0
 
-    # node Named Attribute
-    named_attribute = legolizenodes.nodes.new("GeometryNodeInputNamedAttribute")
-    named_attribute.name = "Named Attribute"
-    named_attribute.data_type = 'FLOAT_VECTOR'
-    # Name
-    named_attribute.inputs[0].default_value = "UVMap"
+    # node Duplicate Elements (one point per brick of the column)
+    duplicate_elements = legolizenodes.nodes.new("GeometryNodeDuplicateElements")
+    duplicate_elements.name = "Duplicate Elements"
+    duplicate_elements.domain = 'POINT'
+    # Selection
+    duplicate_elements.inputs[1].default_value = True
+
+    # node Brick Level
+    brick_level = legolizenodes.nodes.new("ShaderNodeMath")
+    brick_level.name = "Brick Level"
+    brick_level.operation = 'ADD'
+    brick_level.use_clamp = False
+
+    # node Brick Height
+    brick_height = legolizenodes.nodes.new("ShaderNodeMath")
+    brick_height.name = "Brick Height"
+    brick_height.operation = 'MULTIPLY'
+    brick_height.use_clamp = False
+
+    # node Combine XYZ
+    combine_xyz = legolizenodes.nodes.new("ShaderNodeCombineXYZ")
+    combine_xyz.name = "Combine XYZ"
+    # X
+    combine_xyz.inputs[0].default_value = 0.0
+    # Y
+    combine_xyz.inputs[1].default_value = 0.0
+
+    # node Set Position
+    set_position = legolizenodes.nodes.new("GeometryNodeSetPosition")
+    set_position.name = "Set Position"
+    # Selection
+    set_position.inputs[1].default_value = True
+
+    # node Colors Texture
+    colors_texture = legolizenodes.nodes.new("GeometryNodeImageTexture")
+    colors_texture.name = "Colors Texture"
+    colors_texture.extension = 'EXTEND'
+    colors_texture.interpolation = 'Closest'
+    # Frame
+    colors_texture.inputs[2].default_value = 0
 
     # node Store Named Attribute
     store_named_attribute = legolizenodes.nodes.new("GeometryNodeStoreNamedAttribute")
     store_named_attribute.name = "Store Named Attribute"
     store_named_attribute.data_type = 'FLOAT_COLOR'
-    store_named_attribute.domain = 'INSTANCE'
+    store_named_attribute.domain = 'POINT'
     # Selection
     store_named_attribute.inputs[1].default_value = True
     # Name
     store_named_attribute.inputs[2].default_value = "brick_color"
 
+    # node Object Info
+    object_info = legolizenodes.nodes.new("GeometryNodeObjectInfo")
+    object_info.name = "Object Info"
+    object_info.transform_space = 'ORIGINAL'
+    if "Brick" in bpy.data.objects:
+        object_info.inputs[0].default_value = bpy.data.objects["Brick"]
+    # As Instance
+    object_info.inputs[1].default_value = False
+
+    # node Instance on Points (brick_color is carried over from the points to the instances)
+    instance_on_points = legolizenodes.nodes.new("GeometryNodeInstanceOnPoints")
+    instance_on_points.name = "Instance on Points"
+    # Selection
+    instance_on_points.inputs[1].default_value = True
+    # Pick Instance
+    instance_on_points.inputs[3].default_value = False
+    # Instance Index
+    instance_on_points.inputs[4].default_value = 0
+    # Rotation
+    instance_on_points.inputs[5].default_value = (0.0, 0.0, 0.0)
+
     # node Set Material
     set_material = legolizenodes.nodes.new("GeometryNodeSetMaterial")
     set_material.name = "Set Material"
@@ -575,110 +1146,442 @@ def create_geometry_nodes_modifier(obj, scale=1.0, full_size=False):
         set_material.inputs[2].default_value = bpy.data.materials["Brick_material"]
 
     # Set locations
-    original_geom_input.location = (-845.0086059570312, 894.6182861328125)
-    final_geom_output.location = (1331.795654296875, 757.9317016601562)
-    bounding_box.location = (-702.9258422851562, 541.6802978515625)
-    scale_elements.location = (-433.45587158203125, 534.2815551757812)
-    object_info.location = (8.234405517578125, 364.30810546875)
-    instance_on_points.location = (597.2644653320312, 838.5361328125)
-    distribute_points_in_volume_001.location = (-6.63824462890625, 540.81005859375)
-    mesh_to_volume.location = (-262.386474609375, 538.79052734375)
-    value.location = (-441.389892578125, 774.5742797851562)
-    vector.location = (-189.89401245117188, 766.422607421875)
-    vector_math.location = (78.20108032226562, 775.6011962890625)
-    geometry_proximity.location = (92.59027099609375, 988.8936767578125)
-    position.location = (-102.85321044921875, 861.2337646484375)
-    compare.location = (289.01080322265625, 984.46240234375)
-    math.location = (-9.936904907226562, 104.1082763671875)
-    sample_index.location = (702.209228515625, 564.699951171875)
-    sample_nearest.location = (248.6759796142578, 620.1646118164062)
-    image_texture.location = (402.6206970214844, 433.32928466796875)
-    named_attribute.location = (224.06944274902344, 326.6773681640625)
-    store_named_attribute.location = (891.5870361328125, 754.3198852539062)
-    set_material.location = (1111.9998779296875, 735.1043701171875)
+    original_geom_input.location = (-1645.0086059570312, 894.6182861328125)
+    final_geom_output.location = (2722.6206970214844, 757.9317016601562)
+    vector.location = (-1445.0086059570312, 1094.6182861328125)
+    vector_math.location = (-1265.0086059570312, 1094.6182861328125)
+    separate_xyz.location = (-1085.0086059570312, 1094.6182861328125)
+    levels_info.location = (-1265.0086059570312, 794.6182861328125)
+    grid_span.location = (-905.0086059570312, 894.6182861328125)
+    grid_size.location = (-725.0086059570312, 894.6182861328125)
+    grid.location = (-545.0086059570312, 894.6182861328125)
+    mesh_to_points.location = (-365.0086059570312, 894.6182861328125)
+    layout_size.location = (-905.0086059570312, 654.6182861328125)
+    position.location = (-905.0086059570312, 454.6182861328125)
+    layout_uv_scale.location = (-725.0086059570312, 554.6182861328125)
+    layout_uv.location = (-545.0086059570312, 554.6182861328125)
+    levels_texture.location = (-365.0086059570312, 554.6182861328125)
+    separate_levels.location = (-105.0086059570312, 554.6182861328125)
+    column_height.location = (74.9913940429688, 654.6182861328125)
+    column_count.location = (254.9913940429688, 654.6182861328125)
+    duplicate_elements.location = (254.9913940429688, 894.6182861328125)
+    brick_level.location = (434.9913940429688, 654.6182861328125)
+    brick_height.location = (614.9913940429688, 654.6182861328125)
+    combine_xyz.location = (794.9913940429688, 654.6182861328125)
+    set_position.location = (794.9913940429688, 894.6182861328125)
+    colors_texture.location = (794.9913940429688, 454.6182861328125)
+    store_named_attribute.location = (1074.9913940429688, 894.6182861328125)
+    object_info.location = (1074.9913940429688, 1134.6182861328125)
+    instance_on_points.location = (1294.9913940429688, 894.6182861328125)
+    set_material.location = (1474.9913940429688, 894.6182861328125)
 
     # Set dimensions
     original_geom_input.width, original_geom_input.height = 140.0, 100.0
     final_geom_output.width, final_geom_output.height = 140.0, 100.0
-    bounding_box.width, bounding_box.height = 140.0, 100.0
-    scale_elements.width, scale_elements.height = 140.0, 100.0
-    object_info.width, object_info.height = 140.0, 100.0
-    instance_on_points.width, instance_on_points.height = 140.0, 100.0
-    distribute_points_in_volume_001.width, distribute_points_in_volume_001.height = 170.0, 100.0
-    mesh_to_volume.width, mesh_to_volume.height = 200.0, 100.0
-    value.width, value.height = 140.0, 100.0
     vector.width, vector.height = 140.0, 100.0
     vector_math.width, vector_math.height = 140.0, 100.0
-    geometry_proximity.width, geometry_proximity.height = 140.0, 100.0
+    separate_xyz.width, separate_xyz.height = 140.0, 100.0
+    levels_info.width, levels_info.height = 240.0, 100.0
+    grid_span.width, grid_span.height = 140.0, 100.0
+    grid_size.width, grid_size.height = 140.0, 100.0
+    grid.width, grid.height = 140.0, 100.0
+    mesh_to_points.width, mesh_to_points.height = 140.0, 100.0
+    layout_size.width, layout_size.height = 140.0, 100.0
     position.width, position.height = 140.0, 100.0
-    compare.width, compare.height = 140.0, 100.0
-    math.width, math.height = 140.0, 100.0
-    sample_index.width, sample_index.height = 140.0, 100.0
-    sample_nearest.width, sample_nearest.height = 140.0, 100.0
-    image_texture.width, image_texture.height = 240.0, 100.0
-    named_attribute.width, named_attribute.height = 140.0, 100.0
+    layout_uv_scale.width, layout_uv_scale.height = 140.0, 100.0
+    layout_uv.width, layout_uv.height = 140.0, 100.0
+    levels_texture.width, levels_texture.height = 240.0, 100.0
+    separate_levels.width, separate_levels.height = 140.0, 100.0
+    column_height.width, column_height.height = 140.0, 100.0
+    column_count.width, column_count.height = 140.0, 100.0
+    duplicate_elements.width, duplicate_elements.height = 140.0, 100.0
+    brick_level.width, brick_level.height = 140.0, 100.0
+    brick_height.width, brick_height.height = 140.0, 100.0
+    combine_xyz.width, combine_xyz.height = 140.0, 100.0
+    set_position.width, set_position.height = 140.0, 100.0
+    colors_texture.width, colors_texture.height = 240.0, 100.0
     store_named_attribute.width, store_named_attribute.height = 140.0, 100.0
+    object_info.width, object_info.height = 140.0, 100.0
+    instance_on_points.width, instance_on_points.height = 140.0, 100.0
     set_material.width, set_material.height = 140.0, 100.0
 
     # initialize legolizenodes links
-    # original_geom_input.Geometry -> bounding_box.Geometry
-    legolizenodes.links.new(original_geom_input.outputs[0], bounding_box.inputs[0])
-    # bounding_box.Bounding Box -> scale_elements.Geometry
-    legolizenodes.links.new(bounding_box.outputs[0], scale_elements.inputs[0])
-    # object_info.Geometry -> instance_on_points.Instance
-    legolizenodes.links.new(object_info.outputs[3], instance_on_points.inputs[2])
-    # set_material.Geometry -> final_geom_output.Geometry
-    legolizenodes.links.new(set_material.outputs[0], final_geom_output.inputs[0])
-    # distribute_points_in_volume_001.Points -> instance_on_points.Points
-    legolizenodes.links.new(distribute_points_in_volume_001.outputs[0], instance_on_points.inputs[0])
-    # scale_elements.Geometry -> mesh_to_volume.Mesh
-    legolizenodes.links.new(scale_elements.outputs[0], mesh_to_volume.inputs[0])
-    # mesh_to_volume.Volume -> distribute_points_in_volume_001.Volume
-    legolizenodes.links.new(mesh_to_volume.outputs[0], distribute_points_in_volume_001.inputs[0])
-    # value.Value -> instance_on_points.Scale
-    legolizenodes.links.new(value.outputs[0], instance_on_points.inputs[6])
     # vector.Vector -> vector_math.Vector
     legolizenodes.links.new(vector.outputs[0], vector_math.inputs[0])
-    # value.Value -> vector_math.Scale
-    legolizenodes.links.new(value.outputs[0], vector_math.inputs[3])
-    # vector_math.Vector -> distribute_points_in_volume_001.Spacing
-    legolizenodes.links.new(vector_math.outputs[0], distribute_points_in_volume_001.inputs[3])
-    # geometry_proximity.Distance -> compare.A
-    legolizenodes.links.new(geometry_proximity.outputs[1], compare.inputs[0])
-    # compare.Result -> instance_on_points.Selection
-    legolizenodes.links.new(compare.outputs[0], instance_on_points.inputs[1])
-    # geometry_proximity.Position -> compare.A
-    legolizenodes.links.new(geometry_proximity.outputs[0], compare.inputs[4])
-    # position.Position -> geometry_proximity.Sample Position
-    legolizenodes.links.new(position.outputs[0], geometry_proximity.inputs[1])
-    # original_geom_input.Geometry -> geometry_proximity.Geometry
-    legolizenodes.links.new(original_geom_input.outputs[0], geometry_proximity.inputs[0])
-    # value.Value -> math.Value
-    legolizenodes.links.new(value.outputs[0], math.inputs[0])
-    # math.Value -> compare.B
-    legolizenodes.links.new(math.outputs[0], compare.inputs[1])
-    # instance_on_points.Instances -> store_named_attribute.Geometry
-    legolizenodes.links.new(instance_on_points.outputs[0], store_named_attribute.inputs[0])
-    # store_named_attribute.Geometry -> set_material.Geometry
-    legolizenodes.links.new(store_named_attribute.outputs[0], set_material.inputs[0])
-    # named_attribute.Attribute -> image_texture.Vector
-    legolizenodes.links.new(named_attribute.outputs[0], image_texture.inputs[1])
-    # original_geom_input.Geometry -> sample_index.Geometry
-    legolizenodes.links.new(original_geom_input.outputs[0], sample_index.inputs[0])
-    # original_geom_input.Geometry -> sample_nearest.Geometry
-    legolizenodes.links.new(original_geom_input.outputs[0], sample_nearest.inputs[0])
-    # sample_nearest.Index -> sample_index.Index
-    legolizenodes.links.new(sample_nearest.outputs[0], sample_index.inputs[2])
-    # sample_index.Value -> store_named_attribute.Value
-    legolizenodes.links.new(sample_index.outputs[0], store_named_attribute.inputs[3])
-    # image_texture.Color -> sample_index.Value
-    legolizenodes.links.new(image_texture.outputs[0], sample_index.inputs[1])
+    # original_geom_input.Brick Scale -> vector_math.Scale
+    legolizenodes.links.new(original_geom_input.outputs[1], vector_math.inputs[3])
+    # vector_math.Vector -> separate_xyz.Vector
+    legolizenodes.links.new(vector_math.outputs[0], separate_xyz.inputs[0])
+    # levels_info.Width -> grid_span.Value
+    legolizenodes.links.new(levels_info.outputs[0], grid_span.inputs[0])
+    # grid_span.Value -> grid_size.Value
+    legolizenodes.links.new(grid_span.outputs[0], grid_size.inputs[0])
+    # separate_xyz.X -> grid_size.Value
+    legolizenodes.links.new(separate_xyz.outputs[0], grid_size.inputs[1])
+    # grid_size.Value -> grid.Size X
+    legolizenodes.links.new(grid_size.outputs[0], grid.inputs[0])
+    # grid_size.Value -> grid.Size Y
+    legolizenodes.links.new(grid_size.outputs[0], grid.inputs[1])
+    # levels_info.Width -> grid.Vertices X
+    legolizenodes.links.new(levels_info.outputs[0], grid.inputs[2])
+    # levels_info.Width -> grid.Vertices Y
+    legolizenodes.links.new(levels_info.outputs[0], grid.inputs[3])
+    # grid.Mesh -> mesh_to_points.Mesh
+    legolizenodes.links.new(grid.outputs[0], mesh_to_points.inputs[0])
+    # levels_info.Width -> layout_size.Value
+    legolizenodes.links.new(levels_info.outputs[0], layout_size.inputs[0])
+    # separate_xyz.X -> layout_size.Value
+    legolizenodes.links.new(separate_xyz.outputs[0], layout_size.inputs[1])
+    # position.Position -> layout_uv_scale.Vector
+    legolizenodes.links.new(position.outputs[0], layout_uv_scale.inputs[0])
+    # layout_size.Value -> layout_uv_scale.Vector
+    legolizenodes.links.new(layout_size.outputs[0], layout_uv_scale.inputs[1])
+    # layout_uv_scale.Vector -> layout_uv.Vector
+    legolizenodes.links.new(layout_uv_scale.outputs[0], layout_uv.inputs[0])
+    # layout_uv.Vector -> levels_texture.Vector
+    legolizenodes.links.new(layout_uv.outputs[0], levels_texture.inputs[1])
+    # levels_texture.Color -> separate_levels.Color
+    legolizenodes.links.new(levels_texture.outputs[0], separate_levels.inputs[0])
+    # separate_levels.Red -> column_height.Value
+    legolizenodes.links.new(separate_levels.outputs[0], column_height.inputs[0])
+    # separate_levels.Green -> column_height.Value
+    legolizenodes.links.new(separate_levels.outputs[1], column_height.inputs[1])
+    # column_height.Value -> column_count.Value
+    legolizenodes.links.new(column_height.outputs[0], column_count.inputs[0])
+    # mesh_to_points.Points -> duplicate_elements.Geometry
+    legolizenodes.links.new(mesh_to_points.outputs[0], duplicate_elements.inputs[0])
+    # column_count.Value -> duplicate_elements.Amount
+    legolizenodes.links.new(column_count.outputs[0], duplicate_elements.inputs[2])
+    # separate_levels.Green -> brick_level.Value
+    legolizenodes.links.new(separate_levels.outputs[1], brick_level.inputs[0])
+    # duplicate_elements.Duplicate Index -> brick_level.Value
+    legolizenodes.links.new(duplicate_elements.outputs[1], brick_level.inputs[1])
+    # brick_level.Value -> brick_height.Value
+    legolizenodes.links.new(brick_level.outputs[0], brick_height.inputs[0])
+    # separate_xyz.Z -> brick_height.Value
+    legolizenodes.links.new(separate_xyz.outputs[2], brick_height.inputs[1])
+    # brick_height.Value -> combine_xyz.Z
+    legolizenodes.links.new(brick_height.outputs[0], combine_xyz.inputs[2])
+    # duplicate_elements.Geometry -> set_position.Geometry
+    legolizenodes.links.new(duplicate_elements.outputs[0], set_position.inputs[0])
+    # combine_xyz.Vector -> set_position.Offset
+    legolizenodes.links.new(combine_xyz.outputs[0], set_position.inputs[3])
+    # layout_uv.Vector -> colors_texture.Vector
+    legolizenodes.links.new(layout_uv.outputs[0], colors_texture.inputs[1])
+    # set_position.Geometry -> store_named_attribute.Geometry
+    legolizenodes.links.new(set_position.outputs[0], store_named_attribute.inputs[0])
+    # colors_texture.Color -> store_named_attribute.Value
+    legolizenodes.links.new(colors_texture.outputs[0], store_named_attribute.inputs[3])
+    # store_named_attribute.Geometry -> instance_on_points.Points
+    legolizenodes.links.new(store_named_attribute.outputs[0], instance_on_points.inputs[0])
+    # object_info.Geometry -> instance_on_points.Instance
+    legolizenodes.links.new(object_info.outputs[3], instance_on_points.inputs[2])
+    # original_geom_input.Brick Scale -> instance_on_points.Scale
+    legolizenodes.links.new(original_geom_input.outputs[1], instance_on_points.inputs[6])
+    # instance_on_points.Instances -> set_material.Geometry
+    legolizenodes.links.new(instance_on_points.outputs[0], set_material.inputs[0])
+
+    # viewport proxies; the full set_material output is only evaluated for final render
+    display_geometry = create_viewport_proxy_nodes(legolizenodes,
+                                                   full_geometry=set_material.outputs[0],
+                                                   points=store_named_attribute.outputs[0],
+                                                   brick=object_info.outputs[3],
+                                                   brick_scale=original_geom_input.outputs[1],
+                                                   brick_size=vector.outputs[0])
+    # display_geometry -> final_geom_output.Geometry
+    legolizenodes.links.new(display_geometry, final_geom_output.inputs[0])
 
     modifier.node_group = legolizenodes
 
     return legolizenodes
 
 
+def create_viewport_proxy_nodes(legolizenodes, full_geometry, points, brick, brick_scale, brick_size):
+    # Add the viewport display branches to the legolizenodes tree and return the socket to output.
+    # Render always takes full_geometry; the viewport picks a branch with the "Viewport Display" input
+    # (see VIEWPORT_DISPLAY_MODES), thinned out to at most "Viewport Max Instances" points.
+
+    # legolizenodes interface
+    # Socket Viewport Display
+    viewport_display_socket = legolizenodes.interface.new_socket(name="Viewport Display", in_out='INPUT',
+                                                                 socket_type='NodeSocketInt')
+    viewport_display_socket.default_value = 1
+    viewport_display_socket.min_value = 0
+    viewport_display_socket.max_value = len(VIEWPORT_DISPLAY_MODES) - 1
+
+    # Socket Viewport Max Instances
+    viewport_max_socket = legolizenodes.interface.new_socket(name="Viewport Max Instances", in_out='INPUT',
+                                                             socket_type='NodeSocketInt')
+    viewport_max_socket.default_value = 20000
+    viewport_max_socket.min_value = 1
+
+    # node Proxy Input
+    proxy_input = legolizenodes.nodes.new("NodeGroupInput")
+    proxy_input.label = "Proxy Settings"
+    proxy_input.name = "Proxy Input"
+
+    # node Domain Size
+    domain_size = legolizenodes.nodes.new("GeometryNodeAttributeDomainSize")
+    domain_size.name = "Domain Size"
+    domain_size.component = 'POINTCLOUD'
+
+    # node Stride Divide
+    stride_divide = legolizenodes.nodes.new("ShaderNodeMath")
+    stride_divide.name = "Stride Divide"
+    stride_divide.operation = 'DIVIDE'
+    stride_divide.use_clamp = False
+
+    # node Stride Ceil
+    stride_ceil = legolizenodes.nodes.new("ShaderNodeMath")
+    stride_ceil.name = "Stride Ceil"
+    stride_ceil.operation = 'CEIL'
+    stride_ceil.use_clamp = False
+
+    # node Stride Max
+    stride_max = legolizenodes.nodes.new("ShaderNodeMath")
+    stride_max.name = "Stride Max"
+    stride_max.operation = 'MAXIMUM'
+    stride_max.use_clamp = False
+    # Value_001
+    stride_max.inputs[1].default_value = 1.0
+
+    # node Index
+    index = legolizenodes.nodes.new("GeometryNodeInputIndex")
+    index.name = "Index"
+
+    # node Stride Modulo
+    stride_modulo = legolizenodes.nodes.new("ShaderNodeMath")
+    stride_modulo.name = "Stride Modulo"
+    stride_modulo.operation = 'MODULO'
+    stride_modulo.use_clamp = False
+
+    # node Keep Compare
+    keep_compare = legolizenodes.nodes.new("FunctionNodeCompare")
+    keep_compare.name = "Keep Compare"
+    keep_compare.data_type = 'FLOAT'
+    keep_compare.mode = 'ELEMENT'
+    keep_compare.operation = 'LESS_THAN'
+    # B
+    keep_compare.inputs[1].default_value = 0.5
+
+    # node Separate Decimated
+    separate_decimated = legolizenodes.nodes.new("GeometryNodeSeparateGeometry")
+    separate_decimated.name = "Separate Decimated"
+    separate_decimated.domain = 'POINT'
+
+    # node Decimated Instances
+    decimated_instances = legolizenodes.nodes.new("GeometryNodeInstanceOnPoints")
+    decimated_instances.name = "Decimated Instances"
+    # Selection
+    decimated_instances.inputs[1].default_value = True
+    # Pick Instance
+    decimated_instances.inputs[3].default_value = False
+    # Instance Index
+    decimated_instances.inputs[4].default_value = 0
+    # Rotation
+    decimated_instances.inputs[5].default_value = (0.0, 0.0, 0.0)
+
+    # node Point Radius
+    point_radius = legolizenodes.nodes.new("ShaderNodeMath")
+    point_radius.name = "Point Radius"
+    point_radius.operation = 'MULTIPLY'
+    point_radius.use_clamp = False
+    # Value_001
+    point_radius.inputs[1].default_value = 0.4
+
+    # node Set Point Radius
+    set_point_radius = legolizenodes.nodes.new("GeometryNodeSetPointRadius")
+    set_point_radius.name = "Set Point Radius"
+    # Selection
+    set_point_radius.inputs[1].default_value = True
+
+    # node Box
+    box = legolizenodes.nodes.new("GeometryNodeMeshCube")
+    box.name = "Box"
+    # Vertices X
+    box.inputs[1].default_value = 2
+    # Vertices Y
+    box.inputs[2].default_value = 2
+    # Vertices Z
+    box.inputs[3].default_value = 2
+
+    # node Box Offset (bricks sit on their origin, the cube is centred)
+    box_offset = legolizenodes.nodes.new("ShaderNodeVectorMath")
+    box_offset.name = "Box Offset"
+    box_offset.operation = 'MULTIPLY'
+    # Vector_001
+    box_offset.inputs[1].default_value = (0.0, 0.0, 0.5)
+
+    # node Transform Box
+    transform_box = legolizenodes.nodes.new("GeometryNodeTransform")
+    transform_box.name = "Transform Box"
+    # Rotation
+    transform_box.inputs[2].default_value = (0.0, 0.0, 0.0)
+    # Scale
+    transform_box.inputs[3].default_value = (1.0, 1.0, 1.0)
+
+    # node Set Box Material (Set Material skips instances, so the box mesh gets it before instancing;
+    # the material reads brick_color from the instancer like on the bricks)
+    set_box_material = legolizenodes.nodes.new("GeometryNodeSetMaterial")
+    set_box_material.name = "Set Box Material"
+    # Selection
+    set_box_material.inputs[1].default_value = True
+    if "Brick_material" in bpy.data.materials:
+        set_box_material.inputs[2].default_value = bpy.data.materials["Brick_material"]
+
+    # node Box Instances
+    box_instances = legolizenodes.nodes.new("GeometryNodeInstanceOnPoints")
+    box_instances.name = "Box Instances"
+    # Selection
+    box_instances.inputs[1].default_value = True
+    # Pick Instance
+    box_instances.inputs[3].default_value = False
+    # Instance Index
+    box_instances.inputs[4].default_value = 0
+    # Rotation
+    box_instances.inputs[5].default_value = (0.0, 0.0, 0.0)
+
+    # node Viewport Display Switch
+    viewport_display_switch = legolizenodes.nodes.new("GeometryNodeIndexSwitch")
+    viewport_display_switch.name = "Viewport Display Switch"
+    viewport_display_switch.data_type = 'GEOMETRY'
+    while len(viewport_display_switch.index_switch_items) < len(VIEWPORT_DISPLAY_MODES):
+        viewport_display_switch.index_switch_items.new()
+
+    # node Set Proxy Material (for the point cloud)
+    set_proxy_material = legolizenodes.nodes.new("GeometryNodeSetMaterial")
+    set_proxy_material.name = "Set Proxy Material"
+    # Selection
+    set_proxy_material.inputs[1].default_value = True
+    if "Brick_material" in bpy.data.materials:
+        set_proxy_material.inputs[2].default_value = bpy.data.materials["Brick_material"]
+
+    # node Is Viewport
+    is_viewport = legolizenodes.nodes.new("GeometryNodeIsViewport")
+    is_viewport.name = "Is Viewport"
+
+    # node Render Switch
+    render_switch = legolizenodes.nodes.new("GeometryNodeSwitch")
+    render_switch.name = "Render Switch"
+    render_switch.input_type = 'GEOMETRY'
+
+    # Set locations
+    proxy_input.location = (-441.389892578125, -300.0)
+    domain_size.location = (402.6206970214844, -320.0)
+    stride_divide.location = (582.6206970214844, -320.0)
+    stride_ceil.location = (762.6206970214844, -320.0)
+    stride_max.location = (942.6206970214844, -320.0)
+    index.location = (942.6206970214844, -520.0)
+    stride_modulo.location = (1122.6206970214844, -420.0)
+    keep_compare.location = (1302.6206970214844, -420.0)
+    separate_decimated.location = (1482.6206970214844, -160.0)
+    decimated_instances.location = (1902.6206970214844, 40.0)
+    point_radius.location = (1662.6206970214844, -420.0)
+    set_point_radius.location = (1902.6206970214844, -260.0)
+    box.location = (1302.6206970214844, -680.0)
+    box_offset.location = (1302.6206970214844, -900.0)
+    transform_box.location = (1482.6206970214844, -680.0)
+    set_box_material.location = (1662.6206970214844, -680.0)
+    box_instances.location = (1902.6206970214844, -520.0)
+    viewport_display_switch.location = (2142.6206970214844, -160.0)
+    set_proxy_material.location = (2322.6206970214844, -160.0)
+    is_viewport.location = (2322.6206970214844, 120.0)
+    render_switch.location = (2502.6206970214844, 40.0)
+
+    # Set dimensions
+    proxy_input.width, proxy_input.height = 140.0, 100.0
+    domain_size.width, domain_size.height = 140.0, 100.0
+    stride_divide.width, stride_divide.height = 140.0, 100.0
+    stride_ceil.width, stride_ceil.height = 140.0, 100.0
+    stride_max.width, stride_max.height = 140.0, 100.0
+    index.width, index.height = 140.0, 100.0
+    stride_modulo.width, stride_modulo.height = 140.0, 100.0
+    keep_compare.width, keep_compare.height = 140.0, 100.0
+    separate_decimated.width, separate_decimated.height = 140.0, 100.0
+    decimated_instances.width, decimated_instances.height = 140.0, 100.0
+    point_radius.width, point_radius.height = 140.0, 100.0
+    set_point_radius.width, set_point_radius.height = 140.0, 100.0
+    box.width, box.height = 140.0, 100.0
+    box_offset.width, box_offset.height = 140.0, 100.0
+    transform_box.width, transform_box.height = 140.0, 100.0
+    set_box_material.width, set_box_material.height = 140.0, 100.0
+    box_instances.width, box_instances.height = 140.0, 100.0
+    viewport_display_switch.width, viewport_display_switch.height = 140.0, 100.0
+    set_proxy_material.width, set_proxy_material.height = 140.0, 100.0
+    is_viewport.width, is_viewport.height = 140.0, 100.0
+    render_switch.width, render_switch.height = 140.0, 100.0
+
+    # initialize proxy links
+    # points -> domain_size.Geometry
+    legolizenodes.links.new(points, domain_size.inputs[0])
+    # domain_size.Point Count -> stride_divide.Value
+    legolizenodes.links.new(domain_size.outputs[0], stride_divide.inputs[0])
+    # proxy_input.Viewport Max Instances -> stride_divide.Value
+    legolizenodes.links.new(proxy_input.outputs["Viewport Max Instances"], stride_divide.inputs[1])
+    # stride_divide.Value -> stride_ceil.Value
+    legolizenodes.links.new(stride_divide.outputs[0], stride_ceil.inputs[0])
+    # stride_ceil.Value -> stride_max.Value
+    legolizenodes.links.new(stride_ceil.outputs[0], stride_max.inputs[0])
+    # index.Index -> stride_modulo.Value
+    legolizenodes.links.new(index.outputs[0], stride_modulo.inputs[0])
+    # stride_max.Value -> stride_modulo.Value
+    legolizenodes.links.new(stride_max.outputs[0], stride_modulo.inputs[1])
+    # stride_modulo.Value -> keep_compare.A
+    legolizenodes.links.new(stride_modulo.outputs[0], keep_compare.inputs[0])
+    # points -> separate_decimated.Geometry
+    legolizenodes.links.new(points, separate_decimated.inputs[0])
+    # keep_compare.Result -> separate_decimated.Selection
+    legolizenodes.links.new(keep_compare.outputs[0], separate_decimated.inputs[1])
+    # separate_decimated.Selection -> decimated_instances.Points
+    legolizenodes.links.new(separate_decimated.outputs[0], decimated_instances.inputs[0])
+    # brick -> decimated_instances.Instance
+    legolizenodes.links.new(brick, decimated_instances.inputs[2])
+    # brick_scale -> decimated_instances.Scale
+    legolizenodes.links.new(brick_scale, decimated_instances.inputs[6])
+    # brick_scale -> point_radius.Value
+    legolizenodes.links.new(brick_scale, point_radius.inputs[0])
+    # separate_decimated.Selection -> set_point_radius.Points
+    legolizenodes.links.new(separate_decimated.outputs[0], set_point_radius.inputs[0])
+    # point_radius.Value -> set_point_radius.Radius
+    legolizenodes.links.new(point_radius.outputs[0], set_point_radius.inputs[2])
+    # brick_size -> box.Size
+    legolizenodes.links.new(brick_size, box.inputs[0])
+    # brick_size -> box_offset.Vector
+    legolizenodes.links.new(brick_size, box_offset.inputs[0])
+    # box.Mesh -> transform_box.Geometry
+    legolizenodes.links.new(box.outputs[0], transform_box.inputs[0])
+    # box_offset.Vector -> transform_box.Translation
+    legolizenodes.links.new(box_offset.outputs[0], transform_box.inputs[1])
+    # separate_decimated.Selection -> box_instances.Points
+    legolizenodes.links.new(separate_decimated.outputs[0], box_instances.inputs[0])
+    # transform_box.Geometry -> set_box_material.Geometry
+    legolizenodes.links.new(transform_box.outputs[0], set_box_material.inputs[0])
+    # set_box_material.Geometry -> box_instances.Instance
+    legolizenodes.links.new(set_box_material.outputs[0], box_instances.inputs[2])
+    # brick_scale -> box_instances.Scale
+    legolizenodes.links.new(brick_scale, box_instances.inputs[6])
+    # proxy_input.Viewport Display -> viewport_display_switch.Index
+    legolizenodes.links.new(proxy_input.outputs["Viewport Display"], viewport_display_switch.inputs[0])
+    # full_geometry -> viewport_display_switch.0 (FULL)
+    legolizenodes.links.new(full_geometry, viewport_display_switch.inputs[1])
+    # decimated_instances.Instances -> viewport_display_switch.1 (DECIMATE)
+    legolizenodes.links.new(decimated_instances.outputs[0], viewport_display_switch.inputs[2])
+    # set_point_radius.Points -> viewport_display_switch.2 (POINTS)
+    legolizenodes.links.new(set_point_radius.outputs[0], viewport_display_switch.inputs[3])
+    # box_instances.Instances -> viewport_display_switch.3 (BOUNDS)
+    legolizenodes.links.new(box_instances.outputs[0], viewport_display_switch.inputs[4])
+    # viewport_display_switch.Output -> set_proxy_material.Geometry
+    legolizenodes.links.new(viewport_display_switch.outputs[0], set_proxy_material.inputs[0])
+    # full_geometry -> render_switch.False
+    legolizenodes.links.new(full_geometry, render_switch.inputs[1])
+    # set_proxy_material.Geometry -> render_switch.True
+    legolizenodes.links.new(set_proxy_material.outputs[0], render_switch.inputs[2])
+    # is_viewport.Is Viewport -> render_switch.Switch
+    legolizenodes.links.new(is_viewport.outputs[0], render_switch.inputs[0])
+
+    return render_switch.outputs[0]
+
+
 class VIEW3D_PT_legolize_panel(bpy.types.Panel):
     bl_space_type = "VIEW_3D"
     bl_region_type = "UI"
@@ -692,12 +1595,19 @@ class VIEW3D_PT_legolize_panel(bpy.types.Panel):
         layout.prop(settings, "image_folder")
         layout.operator("legolize.select_image_folder", text="Select Folder")
 
+        layout.prop(settings, "use_sequence")
+
         layout.prop(settings, "brick_scale")
 
         layout.prop(settings, "displacement_scale")
 
         layout.prop(settings, "full_size")
 
+        layout.prop(settings, "height_reduction")
+
+        layout.prop(settings, "viewport_display")
+        layout.prop(settings, "viewport_max_instances")
+
         layout.operator("legolize.apply", text="Legolize!")
 
 
@@ -709,8 +1619,12 @@ class LEGOLIZE_OT_Apply(bpy.types.Operator):
     def execute(self, context):
         settings = context.scene.legolize_settings
         try:
-            legolize(brickscale=settings.brick_scale, displacementscale=settings.displacement_scale, use_full_size_brick=settings.full_size)
-            self.report({'INFO'}, f"Successfully legolized!")
+            legolize(brickscale=settings.brick_scale, use_full_size_brick=settings.full_size)
+            if settings.use_sequence and not context.scene.render.use_lock_interface:
+                # the frame change handler can only swap layouts during animation renders with the interface locked
+                self.report({'WARNING'}, "Enable Render > Lock Interface to render Legolize frame sequences")
+            else:
+                self.report({'INFO'}, f"Successfully legolized!")
         except Exception as e:
             self.report({'ERROR'}, f"Error during legolization: {str(e)}")
             return {'CANCELLED'}
@@ -729,9 +1643,21 @@ def register():
     for cls in classes:
         bpy.utils.register_class(cls)
     bpy.types.Scene.legolize_settings = bpy.props.PointerProperty(type=LegolizeSettings)
+    bpy.app.handlers.frame_change_pre.append(legolize_frame_change)
+    bpy.app.handlers.undo_post.append(legolize_undo_redo)
+    bpy.app.handlers.redo_post.append(legolize_undo_redo)
+    bpy.app.handlers.load_post.append(legolize_load_post)
 
 
 def unregister():
+    if legolize_frame_change in bpy.app.handlers.frame_change_pre:
+        bpy.app.handlers.frame_change_pre.remove(legolize_frame_change)
+    for handler in (bpy.app.handlers.undo_post, bpy.app.handlers.redo_post):
+        if legolize_undo_redo in handler:
+            handler.remove(legolize_undo_redo)
+    if legolize_load_post in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(legolize_load_post)
+    _prefetcher.shutdown()
     for cls in reversed(classes):
         bpy.utils.unregister_class(cls)
     del bpy.types.Scene.legolize_settings